@@ -1,14 +1,49 @@
 #!/usr/bin/env python3
 
 import argparse
+import hashlib
+import json
+import mmap
 import os
 import sys
 import subprocess
 import tempfile
 import shutil
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
 import re
 
+DESKTOP_EXTENSIONS = frozenset({'desktop'})
+ICON_EXTENSIONS = frozenset({'png', 'svg', 'xpm', 'ico'})
+MIN_ICON_SIZE = 32
+MAX_ICON_SIZE = 256
+ICON_SIZE_RE = re.compile(r'/(\d+)x\1/')
+
+# Desktop entry keys we read, mapped to their info dict names
+DESKTOP_KEYS = {
+    b'Name': 'name',
+    b'Comment': 'comment',
+    b'Categories': 'categories',
+    b'Icon': 'icon_name',
+}
+DESKTOP_KEY_RE = re.compile(rb'(?m)^[ \t]*(Name|Comment|Categories|Icon)[ \t]*=[ \t]*(.*?)[ \t\r]*$')
+DESKTOP_MMAP_THRESHOLD = 8192
+
+# Bump when extraction, parsing or icon selection changes, so cached results are redone
+CACHE_VERSION = 1
+
+# Filename sanitizing: drop invalid characters, collapse separators into '-'
+INVALID_FILENAME_CHARS_RE = re.compile(r'[^\w\s-]')
+FILENAME_SEPARATORS_RE = re.compile(r'[-\s]+')
+
+# unsquashfs extract patterns covering where AppImages keep their metadata
+METADATA_PATTERNS = [
+    '*.desktop', '.DirIcon', '*.png', '*.svg', '*.xpm', '*.ico',
+    'usr/share/applications', 'usr/share/icons', 'usr/share/pixmaps',
+]
+
 class AppImageDesktopGenerator:
     def __init__(self):
         self.desktop_dirs = [
@@ -16,19 +51,17 @@ class AppImageDesktopGenerator:
             Path("/usr/share/applications"),             # System applications (requires sudo)
             Path("/usr/local/share/applications")       # Local system applications
         ]
+        self.cache_dir = Path.home() / ".cache/appimage2desktop"
     
     def extract_appimage_info(self, appimage_path):
         """Extract information from AppImage using --appimage-extract-and-run"""
-        appimage_path = Path(appimage_path).resolve()
+        appimage_path, st = self._prepare_appimage(appimage_path)
         
-        if not appimage_path.exists():
-            raise FileNotFoundError(f"AppImage not found: {appimage_path}")
-        
-        if not appimage_path.is_file():
-            raise ValueError(f"Path is not a file: {appimage_path}")
-        
-        # Make AppImage executable
-        os.chmod(appimage_path, 0o755)
+        # Reuse a previous extraction if the AppImage has not changed since
+        cache_file = self._cache_file(appimage_path, st)
+        cached_info = self._load_cached_info(cache_file)
+        if cached_info is not None:
+            return cached_info
         
         info = {
             'name': appimage_path.stem,
@@ -38,115 +71,383 @@ class AppImageDesktopGenerator:
             'categories': 'Application;'
         }
         
-        # Try to extract desktop file and icon from AppImage
+        offset = self._squashfs_offset(appimage_path)
+        
+        # Try to read desktop file and icon from AppImage, mounting before extracting
         with tempfile.TemporaryDirectory() as temp_dir:
-            try:
-                # Extract AppImage contents
-                result = subprocess.run(
-                    [str(appimage_path), '--appimage-extract'],
-                    cwd=temp_dir,
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
+            extracted_info = self._parse_mounted_content(appimage_path, offset)
+            if extracted_info is None:
+                squashfs_root = self._extract_metadata_files(appimage_path, offset, temp_dir)
+                if squashfs_root is None:
+                    squashfs_root = self._extract_all(appimage_path, temp_dir)
                 
-                if result.returncode == 0:
-                    squashfs_root = Path(temp_dir) / "squashfs-root"
-                    if squashfs_root.exists():
-                        info.update(self._parse_extracted_content(squashfs_root, appimage_path))
-                        
-            except (subprocess.TimeoutExpired, subprocess.SubprocessError) as e:
-                print(f"Warning: Could not extract AppImage info: {e}")
+                if squashfs_root is not None:
+                    extracted_info = self._parse_extracted_content(squashfs_root, appimage_path)
+            
+            if extracted_info is not None:
+                info.update(extracted_info)
+                self._save_cached_info(cache_file, info)
         
         return info
     
-    def _parse_extracted_content(self, squashfs_root, appimage_path):
-        """Parse extracted AppImage content for desktop file and icon"""
-        info = {}
+    def _prepare_appimage(self, appimage_path):
+        """Validate the AppImage and make it executable, returning its resolved path and stat"""
+        appimage_path = Path(appimage_path).resolve()
+        
+        if not appimage_path.exists():
+            raise FileNotFoundError(f"AppImage not found: {appimage_path}")
+        
+        if not appimage_path.is_file():
+            raise ValueError(f"Path is not a file: {appimage_path}")
+        
+        st = appimage_path.stat()
+        
+        # Make AppImage executable, unless it already is
+        if not st.st_mode & 0o111:
+            os.chmod(appimage_path, 0o755)
+        
+        return appimage_path, st
+    
+    def _cache_file(self, appimage_path, st):
+        """Return the cache file for an AppImage, keyed by path, mtime and size"""
+        key = f"{CACHE_VERSION}:{appimage_path}:{st.st_mtime_ns}:{st.st_size}"
+        return self.cache_dir / hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+    
+    def _icon_name(self, appimage_path):
+        """Return the copied icon's base name, unique per AppImage path"""
+        # Same-named AppImages in different directories must not share (and overwrite) one icon
+        path_hash = hashlib.blake2b(str(appimage_path).encode(), digest_size=4).hexdigest()
+        return f"{appimage_path.stem}-{path_hash}"
+    
+    def _load_cached_info(self, cache_file):
+        """Load cached AppImage info, or None if missing or stale"""
+        try:
+            info = json.loads(cache_file.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        
+        # The copied icon may have been removed since the info was cached
+        if info.get('icon') and not Path(info['icon']).exists():
+            return None
+        
+        return info
+    
+    def _save_cached_info(self, cache_file, info):
+        """Persist extracted AppImage info for later runs"""
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            cache_file.write_text(json.dumps(info), encoding='utf-8')
+        except OSError as e:
+            print(f"Warning: Could not write cache file {cache_file}: {e}")
+    
+    def _parse_mounted_content(self, appimage_path, offset):
+        """Mount the embedded squashfs read-only with squashfuse and parse it in place"""
+        squashfuse = shutil.which('squashfuse')
+        fusermount = shutil.which('fusermount3') or shutil.which('fusermount')
+        if offset is None or not squashfuse or not fusermount:
+            return None
+        
+        # Kept outside the extraction temp directory, whose cleanup must never reach into a mount
+        mountpoint = Path(tempfile.mkdtemp(prefix="appimage2desktop-"))
+        try:
+            result = subprocess.run(
+                [squashfuse, '-o', f'ro,offset={offset}', str(appimage_path), str(mountpoint)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                timeout=30
+            )
+        except (subprocess.TimeoutExpired, subprocess.SubprocessError) as e:
+            print(f"Warning: Could not mount AppImage: {e}")
+            self._unmount(fusermount, mountpoint)
+            return None
+        
+        if result.returncode != 0:
+            print(f"Warning: Could not mount AppImage: {self._failure_reason(result)}")
+            mountpoint.rmdir()
+            return None
+        
+        try:
+            return self._parse_extracted_content(mountpoint, appimage_path)
+        finally:
+            self._unmount(fusermount, mountpoint)
+    
+    def _unmount(self, fusermount, mountpoint):
+        """Lazily unmount a squashfuse mount and remove its mountpoint"""
+        try:
+            result = subprocess.run(
+                [fusermount, '-u', '-z', str(mountpoint)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                timeout=30
+            )
+        except (subprocess.TimeoutExpired, subprocess.SubprocessError) as e:
+            print(f"Warning: Could not unmount {mountpoint}: {e}")
+            return
+        
+        if result.returncode != 0 and os.path.ismount(mountpoint):
+            # Leave the directory in place; removing it would fail inside the mount
+            print(f"Warning: Could not unmount {mountpoint}: {self._failure_reason(result)}")
+            return
+        
+        try:
+            mountpoint.rmdir()
+        except OSError as e:
+            print(f"Warning: Could not remove {mountpoint}: {e}")
+    
+    def _extract_metadata_files(self, appimage_path, offset, temp_dir):
+        """Extract only desktop files and icons from the embedded squashfs"""
+        unsquashfs = shutil.which('unsquashfs')
+        if offset is None or not unsquashfs:
+            return None
+        
+        squashfs_root = Path(temp_dir) / "metadata-root"
+        try:
+            result = subprocess.run(
+                [unsquashfs, '-no-progress', '-offset', str(offset),
+                 '-dest', str(squashfs_root), str(appimage_path)] + METADATA_PATTERNS,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                timeout=30
+            )
+        except (subprocess.TimeoutExpired, subprocess.SubprocessError) as e:
+            print(f"Warning: Could not extract AppImage metadata: {e}")
+            return None
+        
+        if result.returncode != 0:
+            print(f"Warning: Could not extract AppImage metadata: {self._failure_reason(result)}")
+            return None
+        
+        if squashfs_root.exists():
+            return squashfs_root
+        return None
+    
+    def _extract_all(self, appimage_path, temp_dir):
+        """Extract the whole AppImage using its own --appimage-extract"""
+        try:
+            # Extract AppImage contents
+            result = subprocess.run(
+                [str(appimage_path), '--appimage-extract'],
+                cwd=temp_dir,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                timeout=30
+            )
+            
+            if result.returncode == 0:
+                squashfs_root = Path(temp_dir) / "squashfs-root"
+                if squashfs_root.exists():
+                    return squashfs_root
+            else:
+                print(f"Warning: Could not extract AppImage info: {self._failure_reason(result)}")
+                    
+        except (subprocess.TimeoutExpired, subprocess.SubprocessError) as e:
+            print(f"Warning: Could not extract AppImage info: {e}")
+        
+        return None
+    
+    def _failure_reason(self, result):
+        """Describe a failed subprocess from its captured stderr or exit status"""
+        return result.stderr.decode('utf-8', 'replace').strip() or f"exit status {result.returncode}"
+    
+    def _squashfs_offset(self, appimage_path):
+        """Return the squashfs payload offset of a type 2 AppImage, or None"""
+        try:
+            with open(appimage_path, 'rb') as f:
+                header = f.read(64)
+        except OSError:
+            return None
         
-        # Look for .desktop files
-        desktop_files = list(squashfs_root.glob("*.desktop"))
-        if not desktop_files:
-            desktop_files = list(squashfs_root.glob("**/*.desktop"))
+        # Type 2 AppImages carry the 'AI\x02' magic inside the ELF ident padding
+        if header[:4] != b'\x7fELF' or header[8:11] != b'AI\x02':
+            return None
         
-        if desktop_files:
-            desktop_file = desktop_files[0]  # Use the first one found
-            desktop_info = self._parse_desktop_file(desktop_file)
-            info.update(desktop_info)
+        byte_order = '<' if header[5] == 1 else '>'
+        if header[4] == 2:
+            layout = byte_order + '16sHHIQQQIHHHHHH'  # ELFCLASS64
+        else:
+            layout = byte_order + '16sHHIIIIIHHHHHH'  # ELFCLASS32
         
-        # Look for icon files
-        icon_extensions = ['.png', '.svg', '.xpm', '.ico']
-        icon_files = []
+        if len(header) < struct.calcsize(layout):
+            return None
         
-        for ext in icon_extensions:
-            icon_files.extend(squashfs_root.glob(f"**/*{ext}"))
+        fields = struct.unpack_from(layout, header)
+        e_shoff, e_shentsize, e_shnum = fields[6], fields[11], fields[12]
         
-        if icon_files:
+        # The runtime ELF ends with its section header table; squashfs follows
+        return e_shoff + e_shentsize * e_shnum
+    
+    def _parse_extracted_content(self, squashfs_root, appimage_path):
+        """Parse extracted AppImage content for desktop file and icon"""
+        # .DirIcon points at the preferred icon, making the icon walk unnecessary
+        best_icon = self._resolve_dir_icon(squashfs_root)
+        
+        if best_icon is not None:
+            info = self._find_and_parse_desktop(squashfs_root)
+        else:
+            # Overlap the desktop file read with the icon walk; both are I/O-bound
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                desktop_future = executor.submit(self._find_and_parse_desktop, squashfs_root)
+                icons_future = executor.submit(self._collect_icons, squashfs_root)
+                info = desktop_future.result()
+                icon_files = icons_future.result()
+            
             # Try to find the best icon (prefer larger sizes or main app icon)
             best_icon = self._select_best_icon(icon_files, info.get('name', ''))
-            if best_icon:
-                # Copy icon to a permanent location
-                icon_dest = self._copy_icon(best_icon, appimage_path.stem)
-                if icon_dest:
-                    info['icon'] = str(icon_dest)
+        
+        if best_icon:
+            # Copy icon to a permanent location
+            icon_dest = self._copy_icon(best_icon, self._icon_name(appimage_path))
+            if icon_dest:
+                info['icon'] = str(icon_dest)
         
         return info
     
+    def _resolve_dir_icon(self, squashfs_root):
+        """Return the icon file .DirIcon links to, or None if missing or unusable"""
+        try:
+            target = (squashfs_root / os.readlink(squashfs_root / ".DirIcon")).resolve()
+        except OSError:
+            return None
+        
+        # Absolute links would point outside the AppImage
+        if squashfs_root.resolve() not in target.parents:
+            return None
+        
+        if target.suffix.lower().lstrip('.') not in ICON_EXTENSIONS or not target.is_file():
+            return None
+        
+        return target
+    
+    def _find_and_parse_desktop(self, squashfs_root):
+        """Find the AppImage's .desktop file and parse it"""
+        # Check where AppImages conventionally keep it before walking the whole tree
+        candidates = chain(
+            self._iter_dir_files(squashfs_root, DESKTOP_EXTENSIONS),
+            self._iter_dir_files(squashfs_root / "usr/share/applications", DESKTOP_EXTENSIONS),
+            self._iter_extracted_files(squashfs_root, DESKTOP_EXTENSIONS),
+        )
+        desktop_file, _ = next(candidates, (None, None))
+        if desktop_file is None:
+            return {}
+        return self._parse_desktop_file(desktop_file)
+    
+    def _collect_icons(self, squashfs_root):
+        """Collect (path, suffix) icon pairs, preferring the root and hicolor theme over a full walk"""
+        root_files = list(self._iter_dir_files(squashfs_root, ICON_EXTENSIONS | DESKTOP_EXTENSIONS))
+        icon_files = [(path, suffix) for path, suffix in root_files if suffix in ICON_EXTENSIONS]
+        
+        # When the root already describes the app, tiny hicolor icon sizes are not worth walking
+        skip_small_icons = len(icon_files) < len(root_files) or os.path.lexists(squashfs_root / ".DirIcon")
+        
+        icon_files.extend(self._iter_extracted_files(
+            squashfs_root / "usr/share/icons/hicolor", ICON_EXTENSIONS, skip_small_icons
+        ))
+        if not icon_files:
+            # Last resort: any icon, however small, beats none
+            icon_files = list(self._iter_extracted_files(squashfs_root, ICON_EXTENSIONS))
+        return icon_files
+    
+    def _iter_dir_files(self, directory, extensions):
+        """Yield (path, suffix) for files directly in directory with one of the given extensions"""
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    suffix = entry.name.rpartition('.')[2].lower()
+                    if suffix in extensions and entry.is_file():
+                        yield Path(entry.path), suffix
+        except OSError:
+            return
+    
+    def _iter_extracted_files(self, top, extensions, skip_small_icons=False):
+        """Yield (path, suffix) for files below top with one of the given extensions, top-level files first"""
+        def prune(entry):
+            return (skip_small_icons
+                    and os.path.basename(os.path.dirname(entry.path)) == 'hicolor'
+                    and 0 < self._icon_dir_size(entry.name) < MIN_ICON_SIZE)
+        
+        for entry in self._walk_files(str(top), prune):
+            suffix = entry.name.rpartition('.')[2].lower()
+            if suffix in extensions:
+                yield Path(entry.path), suffix
+    
+    def _walk_files(self, top, prune=None):
+        """Yield os.DirEntry objects for files below top, without following directory symlinks"""
+        stack = [top]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if prune is None or not prune(entry):
+                            stack.append(entry.path)
+                    elif entry.is_file():
+                        yield entry
+    
+    def _icon_dir_size(self, dirname):
+        """Return N for a hicolor '<N>x<N>' directory name, or 0 if unsized"""
+        width, _, height = dirname.partition('x')
+        if width.isdigit() and width == height:
+            return int(width)
+        return 0
+    
     def _parse_desktop_file(self, desktop_file_path):
         """Parse a .desktop file and extract relevant information"""
         info = {}
         
         try:
-            with open(desktop_file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Simple parser for .desktop files
-            for line in content.split('\n'):
-                line = line.strip()
-                if '=' in line and not line.startswith('#'):
-                    key, value = line.split('=', 1)
-                    key = key.strip()
-                    value = value.strip()
-                    
-                    if key == 'Name':
-                        info['name'] = value
-                    elif key == 'Comment':
-                        info['comment'] = value
-                    elif key == 'Categories':
-                        info['categories'] = value
-                    elif key == 'Icon':
-                        info['icon_name'] = value
+            with open(desktop_file_path, 'rb') as f:
+                # Map large files (e.g. with many translations) rather than copying them
+                if os.fstat(f.fileno()).st_size > DESKTOP_MMAP_THRESHOLD:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                        info = self._match_desktop_keys(content)
+                else:
+                    info = self._match_desktop_keys(f.read())
                         
         except Exception as e:
             print(f"Warning: Could not parse desktop file {desktop_file_path}: {e}")
         
         return info
     
-    def _select_best_icon(self, icon_files, app_name):
-        """Select the best icon from available options"""
-        if not icon_files:
-            return None
+    def _match_desktop_keys(self, content):
+        """Extract the wanted keys from raw .desktop file bytes"""
+        info = {}
         
-        # Prefer PNG files
-        png_icons = [f for f in icon_files if f.suffix.lower() == '.png']
-        if png_icons:
-            icon_files = png_icons
+        # First occurrence wins, so [Desktop Action] entries cannot override
+        for match in DESKTOP_KEY_RE.finditer(content):
+            key = DESKTOP_KEYS[match.group(1)]
+            if key not in info:
+                info[key] = match.group(2).decode('utf-8', 'replace')
+                if len(info) == len(DESKTOP_KEYS):
+                    break
         
-        # Try to find icon with app name in filename
+        return info
+    
+    def _select_best_icon(self, icon_files, app_name):
+        """Select the best icon from available (path, suffix) pairs"""
         app_name_lower = app_name.lower()
-        name_matches = [f for f in icon_files if app_name_lower in f.name.lower()]
-        if name_matches:
-            return name_matches[0]
+        best_icon, best_score = None, -1
         
-        # Look for common icon names
-        common_names = ['icon', 'logo', 'app', 'main']
-        for common in common_names:
-            matches = [f for f in icon_files if common in f.name.lower()]
-            if matches:
-                return matches[0]
+        # Prefer icons named after the app, then PNGs, then the largest size up to 256px
+        for f, suffix in icon_files:
+            score = 0
+            if suffix == 'png':
+                score += 1000
+            
+            match = ICON_SIZE_RE.search(str(f))
+            if match:
+                score += min(int(match.group(1)), MAX_ICON_SIZE)
+            
+            if app_name_lower and app_name_lower in f.name.lower():
+                score += 2000
+            
+            if score > best_score:
+                best_icon, best_score = f, score
         
-        # Return the first available icon
-        return icon_files[0]
+        return best_icon
     
     def _copy_icon(self, icon_path, app_name):
         """Copy icon to user's icon directory"""
@@ -157,18 +458,39 @@ class AppImageDesktopGenerator:
         icon_dest = icon_dir / f"{app_name}{icon_path.suffix}"
         
         try:
-            shutil.copy2(icon_path, icon_dest)
+            shutil.copyfile(icon_path, icon_dest)
             return icon_dest
         except Exception as e:
             print(f"Warning: Could not copy icon: {e}")
             return None
     
-    def create_desktop_file(self, appimage_path, output_dir=None, name=None, comment=None, categories=None):
+    def create_desktop_file(self, appimage_path, output_dir=None, name=None, comment=None, categories=None, icon=None):
         """Create a .desktop file for the AppImage"""
+        info = self.build_desktop_info(appimage_path, name, comment, categories, icon)
+        return self.write_desktop_file(info, self.desktop_file_path(info, output_dir))
+    
+    def build_desktop_info(self, appimage_path, name=None, comment=None, categories=None, icon=None):
+        """Gather desktop entry info for the AppImage, applying user-provided overrides"""
+        if icon:
+            # Icon= may be a theme icon name; only paths to existing files are made absolute
+            icon_path = Path(icon).expanduser()
+            if icon_path.is_file():
+                icon = str(icon_path.resolve())
         
-        # Extract AppImage information
-        print(f"Analyzing AppImage: {appimage_path}")
-        info = self.extract_appimage_info(appimage_path)
+        if name and comment and categories and icon:
+            # Everything extraction would provide was given, so skip it
+            appimage_path, _ = self._prepare_appimage(appimage_path)
+            info = {
+                'name': name,
+                'exec': str(appimage_path),
+                'icon': icon,
+                'comment': comment,
+                'categories': categories
+            }
+        else:
+            # Extract AppImage information
+            print(f"Analyzing AppImage: {appimage_path}")
+            info = self.extract_appimage_info(appimage_path)
         
         # Override with user-provided values
         if name:
@@ -177,28 +499,38 @@ class AppImageDesktopGenerator:
             info['comment'] = comment
         if categories:
             info['categories'] = categories
+        if icon:
+            info['icon'] = icon
         
+        return info
+    
+    def desktop_file_path(self, info, output_dir=None):
+        """Return where the .desktop file for the given info is written"""
         # Determine output directory
         if output_dir:
             desktop_dir = Path(output_dir)
         else:
             desktop_dir = self.desktop_dirs[0]  # Default to user applications
         
-        desktop_dir.mkdir(parents=True, exist_ok=True)
+        desktop_filename = f"{self._sanitize_filename(info['name'])}.desktop"
+        return desktop_dir / desktop_filename
+    
+    def write_desktop_file(self, info, desktop_path):
+        """Write the .desktop file for the given info"""
+        desktop_path.parent.mkdir(parents=True, exist_ok=True)
         
         # Create desktop file content
         desktop_content = self._generate_desktop_content(info)
         
-        # Write desktop file
-        desktop_filename = f"{self._sanitize_filename(info['name'])}.desktop"
-        desktop_path = desktop_dir / desktop_filename
-        
         try:
-            with open(desktop_path, 'w', encoding='utf-8') as f:
-                f.write(desktop_content)
-            
-            # Make desktop file executable
-            os.chmod(desktop_path, 0o755)
+            # Create the desktop file executable up front instead of chmod-ing it afterwards
+            data = desktop_content.encode('utf-8')
+            fd = os.open(desktop_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o755)
+            try:
+                while data:
+                    data = data[os.write(fd, data):]
+            finally:
+                os.close(fd)
             
             print(f"✓ Desktop file created: {desktop_path}")
             return desktop_path
@@ -225,16 +557,21 @@ StartupNotify=true
     def _sanitize_filename(self, filename):
         """Sanitize filename for use in filesystem"""
         # Remove or replace invalid characters
-        filename = re.sub(r'[^\w\s-]', '', filename)
-        filename = re.sub(r'[-\s]+', '-', filename)
+        filename = INVALID_FILENAME_CHARS_RE.sub('', filename)
+        filename = FILENAME_SEPARATORS_RE.sub('-', filename)
         return filename.strip('-')
     
     def list_desktop_directories(self):
         """List available desktop file directories"""
         print("Available desktop file directories:")
         for i, directory in enumerate(self.desktop_dirs, 1):
-            exists = "✓" if directory.exists() else "✗"
-            writable = "✓" if directory.exists() and os.access(directory, os.W_OK) else "✗"
+            # One stat per directory; access() is only needed when it exists
+            try:
+                os.stat(directory)
+                exists = "✓"
+                writable = "✓" if os.access(directory, os.W_OK) else "✗"
+            except OSError:
+                exists = writable = "✗"
             print(f"  {i}. {directory} (exists: {exists}, writable: {writable})")
 
 def main():
@@ -244,17 +581,19 @@ def main():
         epilog="""
 Examples:
   %(prog)s MyApp.AppImage
+  %(prog)s ~/Applications/*.AppImage
   %(prog)s MyApp.AppImage --name "My Application" --comment "A great app"
   %(prog)s MyApp.AppImage --output-dir ~/.local/share/applications
   %(prog)s --list-dirs
         """
     )
     
-    parser.add_argument('appimage', nargs='?', help='Path to the AppImage file')
+    parser.add_argument('appimage', nargs='*', help='Path to the AppImage file(s)')
     parser.add_argument('-o', '--output-dir', help='Output directory for .desktop file')
     parser.add_argument('-n', '--name', help='Application name (overrides extracted name)')
     parser.add_argument('-c', '--comment', help='Application comment/description')
     parser.add_argument('--categories', help='Desktop categories (e.g., "Graphics;Photography;")')
+    parser.add_argument('-i', '--icon', help='Icon file path or theme icon name (overrides extracted icon)')
     parser.add_argument('--list-dirs', action='store_true', help='List available desktop directories')
     
     args = parser.parse_args()
@@ -268,20 +607,53 @@ Examples:
     if not args.appimage:
         parser.error("AppImage path is required (or use --list-dirs)")
     
-    try:
-        desktop_path = generator.create_desktop_file(
-            args.appimage,
-            output_dir=args.output_dir,
-            name=args.name,
-            comment=args.comment,
-            categories=args.categories
-        )
+    if args.name and len(args.appimage) > 1:
+        parser.error("--name can only be used with a single AppImage")
+    
+    def build_info(appimage_path):
+        try:
+            return generator.build_desktop_info(
+                appimage_path,
+                name=args.name,
+                comment=args.comment,
+                categories=args.categories,
+                icon=args.icon
+            ), None
+        except Exception as e:
+            return None, e
+    
+    # Extraction is subprocess- and I/O-bound, so threads overlap multiple AppImages
+    with ThreadPoolExecutor(max_workers=min(8, len(args.appimage))) as executor:
+        results = list(executor.map(build_info, args.appimage))
+    
+    # Write desktop files one at a time, so AppImages with the same name cannot overwrite each other
+    written = {}
+    errors = 0
+    for appimage_path, (info, error) in zip(args.appimage, results):
+        if error is None:
+            desktop_path = generator.desktop_file_path(info, args.output_dir)
+            if desktop_path in written:
+                error = f"{desktop_path} was already created for {written[desktop_path]}"
+            else:
+                try:
+                    generator.write_desktop_file(info, desktop_path)
+                    written[desktop_path] = appimage_path
+                except Exception as e:
+                    error = e
         
-        print(f"\n✓ Success! Desktop file created at: {desktop_path}")
+        if error is None:
+            print(f"\n✓ Success! Desktop file created at: {desktop_path}")
+        elif len(args.appimage) == 1:
+            print(f"✗ Error: {error}", file=sys.stderr)
+            errors += 1
+        else:
+            print(f"✗ Error: {appimage_path}: {error}", file=sys.stderr)
+            errors += 1
+    
+    if errors < len(results):
         print("The application should now appear in your application launcher.")
-        
-    except Exception as e:
-        print(f"✗ Error: {e}", file=sys.stderr)
+    
+    if errors:
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -22,9 +22,26 @@ fi
 
 TARGET_PATH="$TARGET_DIR/$SCRIPT_NAME"
 
+# The script itself lives in a lib directory so it can be imported from
+# precompiled bytecode; a script run directly is recompiled on every start.
+LIB_DIR="$HOME/.local/lib/$SCRIPT_NAME"
+mkdir -p "$LIB_DIR"
+
 # Download the script
 echo "Downloading $SCRIPT_NAME from $SCRIPT_URL..."
-curl -fsSL "$SCRIPT_URL" -o "$TARGET_PATH"
+curl -fsSL "$SCRIPT_URL" -o "$LIB_DIR/$SCRIPT_NAME.py"
+
+# Precompile it
+python3 -m compileall -q "$LIB_DIR"
+
+# Write a small launcher that imports the compiled module
+cat > "$TARGET_PATH" <<EOF
+#!/usr/bin/env python3
+import sys
+sys.path.insert(0, "$LIB_DIR")
+from $SCRIPT_NAME import main
+main()
+EOF
 
 # Make it executable
 chmod +x "$TARGET_PATH"